@@ -1,6 +1,11 @@
-from PIL import Image, ImageDraw, ImageOps
+import argparse
 import os
 
+from PIL import Image, ImageDraw
+
+# The dice folders live next to this script, where dice_pipeline reads them
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
 
 # Function to create a dice face
 def create_dice_face(number, dice_color, dot_color, size=200):
@@ -39,16 +44,45 @@ dice_colors = {
     'yellow': ('yellow', 'white')
 }
 
-# Generate dice faces for each color
-for color_name, (dice_color, dot_color) in dice_colors.items():
-    folder_name = f'dice_{color_name}'
-    if not os.path.exists(folder_name):
-        os.makedirs(folder_name)
-    for i in range(1, 7):
-        img = create_dice_face(i, dice_color=dice_color, dot_color=dot_color)
-        img.save(f'{folder_name}/{i}.png')
-    # Create solid dice images
-    solid_dice = Image.new('RGB', (200, 200), color=dice_color)
-    solid_dice.save(f'{folder_name}/solid_{color_name}.png')
-
-print("Dice face images have been generated for all colors.")
+
+def asset_paths(color_name):
+    """Return the paths of the face and solid images for one dice color."""
+    folder_name = os.path.join(ASSET_DIR, f'dice_{color_name}')
+    paths = [os.path.join(folder_name, f'{i}.png') for i in range(1, 7)]
+    paths.append(os.path.join(folder_name, f'solid_{color_name}.png'))
+    return paths
+
+
+def assets_exist():
+    """Return True when every asset exists.
+
+    File times are not compared, since a checkout sets them in arbitrary
+    order; run with --force after changing how the faces are drawn.
+    """
+    return all(os.path.exists(path) for color_name in dice_colors for path in asset_paths(color_name))
+
+
+def generate_dice_faces():
+    """Generate dice faces for each color."""
+    for color_name, (dice_color, dot_color) in dice_colors.items():
+        folder_name = os.path.join(ASSET_DIR, f'dice_{color_name}')
+        if not os.path.exists(folder_name):
+            os.makedirs(folder_name)
+        for i in range(1, 7):
+            img = create_dice_face(i, dice_color=dice_color, dot_color=dot_color)
+            img.save(os.path.join(folder_name, f'{i}.png'))
+        # Create solid dice images
+        solid_dice = Image.new('RGB', (200, 200), color=dice_color)
+        solid_dice.save(os.path.join(folder_name, f'solid_{color_name}.png'))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Generate the dice face images.")
+    parser.add_argument('--force', action='store_true', help="Regenerate even if the images already exist")
+    args = parser.parse_args()
+
+    if not args.force and assets_exist():
+        print("Dice face images already exist, nothing to generate (use --force to rebuild them).")
+    else:
+        generate_dice_faces()
+        print("Dice face images have been generated for all colors.")
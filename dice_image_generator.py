@@ -1,11 +1,22 @@
-import numpy as np
-from PIL import Image, ImageTk
+import os
+import queue
+import threading
+import time
 import tkinter as tk
 from tkinter import filedialog, messagebox, ttk
-from openpyxl import Workbook
 
-# Constants
-INCHES_PER_FOOT = 12
+# NumPy, PIL and openpyxl are imported on first use so the window appears
+# without waiting for them; see warm_up_in_background().
+
+# Launch time for the first paint report; startup_benchmark.py passes the
+# time it started the interpreter so startup and imports are included
+_launch_time = float(os.environ.get('DICE_LAUNCH_TIME') or time.time())
+
+# Optional render service, e.g. http://127.0.0.1:8765 (see dice_service.py)
+DICE_SERVICE_URL = os.environ.get('DICE_SERVICE_URL', '')
+BACKGROUND_POLL_MS = 50  # How often the GUI checks for background results
+# Set by startup_benchmark.py to print the seconds from launch to first paint and exit
+EXIT_AFTER_FIRST_PAINT = os.environ.get('DICE_EXIT_AFTER_FIRST_PAINT') == '1'
 
 # Create the main window
 root = tk.Tk()
@@ -50,65 +61,42 @@ def browse_image():
         image_path_var.set(file_path)
 
 
-def floyd_steinberg_dithering(img_array):
-    """Applies Floyd-Steinberg dithering to the image array."""
-    height, width = img_array.shape
-    new_img = img_array.astype(float)
-
-    for y in range(height):
-        for x in range(width):
-            old_pixel = new_img[y, x]
-            new_pixel = np.round(old_pixel / 32) * 32  # Quantize to 8 levels (0-7)
-            quant_error = old_pixel - new_pixel
-            new_img[y, x] = new_pixel
-
-            if x + 1 < width:
-                new_img[y, x + 1] += quant_error * 7 / 16
-            if x - 1 >= 0 and y + 1 < height:
-                new_img[y + 1, x - 1] += quant_error * 3 / 16
-            if y + 1 < height:
-                new_img[y + 1, x] += quant_error * 5 / 16
-            if x + 1 < width and y + 1 < height:
-                new_img[y + 1, x + 1] += quant_error * 1 / 16
-
-    # Normalize new_img to 0-7
-    dice_values = np.floor(new_img / 32).astype(int)
-    dice_values = np.clip(dice_values, 0, 7)
-    return dice_values
-
-
-def map_grayscale_to_colors(dice_values, selected_colors):
-    """Map dice values to colors based on grayscale intensity."""
-    # Define perceived brightness for each color
-    color_brightness = {
-        'black': 0,
-        'red': 76,
-        'blue': 29,
-        'yellow': 225,
-        'white': 255
-    }
-
-    # Filter brightness for selected colors
-    selected_brightness = {color: color_brightness[color] for color in selected_colors}
-    # Sort colors by brightness
-    sorted_colors = sorted(selected_brightness, key=selected_brightness.get)
-    num_colors = len(sorted_colors)
-
-    # Map dice values to color indices
-    color_indices = (dice_values / 7 * (num_colors - 1)).astype(int)
-    color_indices = np.clip(color_indices, 0, num_colors - 1)
-
-    # Create a color map
-    color_map = {i: sorted_colors[i] for i in range(num_colors)}
-    # Map to colors
-    color_mapped_values = np.vectorize(color_map.get)(color_indices)
-    return color_mapped_values
+def warm_up_in_background():
+    """Import the image libraries and load the dice sprites off the GUI thread."""
+    def warm_up():
+        try:
+            import dice_pipeline
+            from PIL import ImageTk  # noqa: F401
+            dice_pipeline.warm_sprite_cache()
+        except Exception:
+            pass  # Any failure is reported again when generating
+
+    threading.Thread(target=warm_up, daemon=True).start()
+
+
+def on_first_expose(event):
+    """Wait for the widget redraws queued by the first Expose, then report the paint."""
+    root.unbind('<Expose>')
+    # Idle callbacks run in order, so this one runs after those redraws
+    root.after_idle(on_first_paint)
+
+
+def on_first_paint():
+    """Called once the window has been drawn for the first time."""
+    if EXIT_AFTER_FIRST_PAINT:
+        print(f"first_paint_seconds={time.time() - _launch_time:.4f}")
+        root.destroy()
+        return
+    warm_up_in_background()
 
 
 def generate_dice_image():
     """Function to generate the dice image based on user inputs."""
-    global last_output_img, dice_layout_text
     try:
+        from PIL import Image
+
+        import dice_pipeline
+
         # Get user inputs
         physical_width_ft = physical_width_var.get()
         physical_height_ft = physical_height_var.get()
@@ -123,44 +111,17 @@ def generate_dice_image():
             messagebox.showerror("Error", "Please select an image file.")
             return
 
-        if physical_width_ft <= 0 or physical_height_ft <= 0:
-            messagebox.showerror("Error", "Please enter valid physical dimensions.")
-            return
-
-        if dice_type == 'Colored Dice' and not selected_colors:
-            messagebox.showerror("Error", "Please select at least one dice color.")
-            return
-
-        # Set dice size based on the selected option
-        if dice_size_option == 'Standard Dice (0.625")':
-            DICE_SIZE_INCHES = 0.625
-        elif dice_size_option == 'Mini Dice (0.27")':
-            DICE_SIZE_INCHES = 0.27
-        elif dice_size_option == 'Micro Dice (0.19685")':
-            DICE_SIZE_INCHES = 0.19685  # 5 mm in inches
-        else:
-            messagebox.showerror("Error", "Invalid dice size selected.")
-            return
-
-        # Convert physical dimensions to inches
-        physical_width_in = physical_width_ft * INCHES_PER_FOOT
-        physical_height_in = physical_height_ft * INCHES_PER_FOOT
-
-        # Calculate the number of dice horizontally and vertically
-        num_dice_horizontal = int(round(physical_width_in / DICE_SIZE_INCHES))
-        num_dice_vertical = int(round(physical_height_in / DICE_SIZE_INCHES))
-
-        # Load the image
-        img = Image.open(image_path)
-        image_width, image_height = img.size
+        dice_pipeline.validate_options(
+            physical_width_ft, physical_height_ft, dice_type, dice_option,
+            dice_size_option, selected_colors
+        )
 
-        # Calculate aspect ratios
-        image_aspect_ratio = image_width / image_height
-        desired_aspect_ratio = physical_width_in / physical_height_in
+        # Read the image size
+        with Image.open(image_path) as img:
+            image_size = img.size
 
         # Compare aspect ratios
-        tolerance = 0.1  # Allowable difference in aspect ratio
-        if abs(image_aspect_ratio - desired_aspect_ratio) > tolerance:
+        if dice_pipeline.aspect_ratio_mismatch(image_size, physical_width_ft, physical_height_ft):
             proceed = messagebox.askyesno(
                 "Aspect Ratio Mismatch",
                 "The aspect ratio of the image does not match the desired physical dimensions. Do you want to proceed anyway?"
@@ -168,158 +129,95 @@ def generate_dice_image():
             if not proceed:
                 return
 
-        # Convert image to grayscale
-        img = img.convert('L')
+        options = (physical_width_ft, physical_height_ft, dice_type, dice_option,
+                   dice_size_option, selected_colors)
+        if DICE_SERVICE_URL:
+            import dice_service
+            generate_button.config(state=tk.DISABLED)
+            run_in_background(
+                lambda: dice_service.run_job(DICE_SERVICE_URL, image_path, *options),
+                lambda result, error: finish_service_job(result, error, image_path, options)
+            )
+            return
 
-        # Resize the image
-        img = img.resize((num_dice_horizontal, num_dice_vertical), Image.LANCZOS)
+        render_locally(image_path, options)
 
-        # Convert image to numpy array
-        img_array = np.array(img)
+    except Exception as e:
+        messagebox.showerror("Error", str(e))
 
-        # Apply dithering
-        dice_values = floyd_steinberg_dithering(img_array)
 
-        if dice_type == 'Colored Dice':
-            # Map grayscale values to selected colors
-            dice_colors = map_grayscale_to_colors(dice_values, selected_colors)
-        elif dice_option == 'Combined Dice':
-            # Map grayscale values to black and white based on thresholds
-            dice_colors = np.where(dice_values <= 3, 'black', 'white')
-        else:
-            dice_colors = np.full(dice_values.shape, dice_option.lower().split()[0])  # e.g., 'white' or 'black'
+def render_locally(image_path, options):
+    """Run the pipeline in this process and show the result."""
+    from PIL import Image
 
-        # Generate the dice image preview
-        output_img, dice_faces = create_dice_image(
-            dice_values, dice_type, dice_option, selected_colors,
-            num_dice_horizontal, num_dice_vertical, dice_colors
-        )
-        if output_img is None:
-            return  # Error occurred
+    import dice_pipeline
 
-        last_output_img = output_img  # Store the generated image
+    with Image.open(image_path) as img:
+        result = dice_pipeline.generate_mosaic(img, *options)
+    show_result(result['mosaic'], result['layout_text'], result['total_text'])
 
-        # Update the preview in the GUI
-        display_preview(output_img)
 
-        # Build the dice layout and total number of dice
-        dice_layout_text = build_layout_and_count(
-            dice_colors, dice_faces,
-            num_dice_horizontal, num_dice_vertical,
-            dice_type, selected_colors
-        )
+def run_in_background(work, on_done):
+    """Run work() on a worker thread, then call on_done(result, error) on the GUI thread."""
+    results = queue.Queue()
 
-    except Exception as e:
-        messagebox.showerror("Error", str(e))
+    def worker():
+        try:
+            results.put((work(), None))
+        except Exception as e:
+            results.put((None, e))
+
+    def check():
+        try:
+            result, error = results.get_nowait()
+        except queue.Empty:
+            root.after(BACKGROUND_POLL_MS, check)
+            return
+        on_done(result, error)
 
+    threading.Thread(target=worker, daemon=True).start()
+    root.after(BACKGROUND_POLL_MS, check)
 
-def create_dice_image(
-        dice_values, dice_type, dice_option, selected_colors,
-        num_dice_horizontal, num_dice_vertical, dice_colors
-):
-    """Function to create the dice image based on the dice values and options."""
-    dice_face_size_px = 16  # Adjust size for GUI display
-    dice_imgs = {}
-    dice_faces = np.empty(dice_values.shape, dtype=object)
 
+def finish_service_job(result, error, image_path, options):
+    """Show the result of a render service job, falling back to local rendering."""
+    import io
+
+    from PIL import Image
+
+    import dice_service
+
+    generate_button.config(state=tk.NORMAL)
     try:
-        if dice_type == 'Monochrome Dice':
-            if dice_option == 'White Dice':
-                dice_color = 'white'
-            elif dice_option == 'Black Dice':
-                dice_color = 'black'
-            elif dice_option == 'Combined Dice':
-                # Load both white and black dice images
-                dice_imgs['black'] = {}
-                dice_imgs['white'] = {}
-                # Load dice face images
-                for i in range(1, 7):
-                    dice_imgs['black'][str(i)] = Image.open(f'dice_black/{i}.png').resize(
-                        (dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                    dice_imgs['white'][str(i)] = Image.open(f'dice_white/{i}.png').resize(
-                        (dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                # Load solid dice images
-                dice_imgs['black']['solid'] = Image.open('dice_black/solid_black.png').resize(
-                    (dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                dice_imgs['white']['solid'] = Image.open('dice_white/solid_white.png').resize(
-                    (dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-            else:
-                messagebox.showerror("Error", "Invalid dice option selected.")
-                return None, None
-
-            if dice_option != 'Combined Dice':
-                # Load dice face images for single color
-                dice_imgs = {}
-                for i in range(1, 7):
-                    path = f"dice_{dice_color}/{i}.png"
-                    dice_img = Image.open(path).resize((dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                    dice_imgs[str(i)] = dice_img
-
-                # Load solid dice images
-                dice_imgs['solid'] = Image.open(f'dice_{dice_color}/solid_{dice_color}.png').resize(
-                    (dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-
-        elif dice_type == 'Colored Dice':
-            # Load dice images for selected colors
-            for color in selected_colors:
-                # Load dice face images
-                color_imgs = {}
-                for i in range(1, 7):
-                    path = f'dice_{color}/{i}.png'
-                    dice_img = Image.open(path).resize((dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                    color_imgs[str(i)] = dice_img
-                # Load solid dice image
-                solid_path = f'dice_{color}/solid_{color}.png'
-                solid_img = Image.open(solid_path).resize((dice_face_size_px, dice_face_size_px), Image.LANCZOS)
-                color_imgs['solid'] = solid_img
-                # Store images for the color
-                dice_imgs[color] = color_imgs
+        if isinstance(error, (OSError, dice_service.JobNotFound)):
+            # Service unreachable or the result was evicted, render locally instead
+            render_locally(image_path, options)
+        elif error is not None:
+            messagebox.showerror("Error", f"Render service error: {error}")
         else:
-            messagebox.showerror("Error", "Invalid dice type selected.")
-            return None, None
-
-        # Create a new image to hold the dice layout
-        output_img = Image.new('RGB', (num_dice_horizontal * dice_face_size_px, num_dice_vertical * dice_face_size_px))
-
-        for y in range(num_dice_vertical):
-            for x in range(num_dice_horizontal):
-                if dice_type == 'Colored Dice':
-                    color = dice_colors[y, x]
-                    # Map grayscale intensity to dice face value (1-6)
-                    dice_face_value = int(dice_values[y, x] % 6) + 1  # Values between 1 and 6
-                    dice_face_img = dice_imgs[color][str(dice_face_value)]
-                    dice_faces[y, x] = f"{color[:3].capitalize()}{dice_face_value}"
-                else:
-                    dice_value = dice_values[y, x]
-                    color = dice_colors[y, x]
-                    if dice_option == 'Combined Dice':
-                        # Map values to images
-                        if dice_value == 0 or dice_value == 7:
-                            dice_face_img = dice_imgs[color]['solid']
-                            dice_faces[y, x] = f"{color[:3].capitalize()}S"
-                        else:
-                            dice_face_img = dice_imgs[color][str(dice_value)]
-                            dice_faces[y, x] = f"{color[:3].capitalize()}{dice_value}"
-                    else:
-                        if dice_value == 0 or dice_value == 7:
-                            dice_face_img = dice_imgs['solid']
-                            dice_faces[y, x] = f"{dice_color[:3].capitalize()}S"
-                        else:
-                            dice_face_img = dice_imgs[str(dice_value)]
-                            dice_faces[y, x] = f"{dice_color[:3].capitalize()}{dice_value}"
-
-                output_img.paste(dice_face_img, (x * dice_face_size_px, y * dice_face_size_px))
-
-        return output_img, dice_faces
-
+            mosaic, layout_text, counts = result
+            show_result(Image.open(io.BytesIO(mosaic)), layout_text, counts['total_text'])
     except Exception as e:
-        messagebox.showerror("Error", f"Error creating dice image: {str(e)}")
-        return None, None
+        messagebox.showerror("Error", str(e))
+
+
+def show_result(output_img, layout_text, total_dice_text):
+    """Store a generated mosaic and show it with its dice totals."""
+    global last_output_img, dice_layout_text
+    last_output_img = output_img  # Store the generated image
+    dice_layout_text = layout_text
+
+    # Update the preview in the GUI
+    display_preview(output_img)
+
+    # Update the total dice label
+    total_dice_label.config(text=total_dice_text)
 
 
 def display_preview(image):
     """Function to display the preview image in the GUI."""
     global preview_image_tk  # Keep a reference to prevent garbage collection
+    from PIL import Image, ImageTk
 
     # Resize the image to fit within the canvas while maintaining aspect ratio
     canvas_width = preview_canvas.winfo_width()
@@ -351,78 +249,6 @@ def display_preview(image):
     preview_canvas.create_image(x, y, anchor='nw', image=preview_image_tk)
 
 
-def build_layout_and_count(
-        dice_colors, dice_faces, num_dice_horizontal, num_dice_vertical,
-        dice_type, selected_colors
-):
-    """Function to build the dice layout text and count dice by color."""
-    # Display total number of dice needed
-    total_dice = num_dice_horizontal * num_dice_vertical
-
-    # Count the number of dice for each color
-    color_counts = {}
-    if dice_type == 'Colored Dice':
-        unique_colors, counts = np.unique(dice_colors, return_counts=True)
-        for color, count in zip(unique_colors, counts):
-            color_counts[color] = count
-    else:
-        # For monochrome dice
-        if dice_option_var.get() == 'Combined Dice':
-            unique_colors, counts = np.unique(dice_colors, return_counts=True)
-            for color, count in zip(unique_colors, counts):
-                color_counts[color] = count
-        else:
-            color = dice_option_var.get().split()[0].lower()
-            color_counts[color] = total_dice
-
-    # Build the total dice text
-    total_dice_text = f"Total number of dice needed: {total_dice}\n"
-    for color, count in color_counts.items():
-        color_name = color.capitalize()
-        total_dice_text += f"  {color_name} dice: {count}\n"
-
-    # Build the dice layout grid
-    layout_lines = []
-
-    # Header row with column numbers
-    header = "    |" + "|".join(f"{col:>5}" for col in range(1, num_dice_horizontal + 1)) + "|"
-    separator = "----" + "+-----" * num_dice_horizontal + "+"
-    layout_lines.append(header)
-    layout_lines.append(separator)
-
-    for idx, row in enumerate(dice_faces):
-        row_num = f"{idx + 1:>3} |"
-        row_values = "|".join(f"{val:>5}" for val in row)
-        layout_lines.append(f"{row_num}{row_values}|")
-        layout_lines.append(separator)
-
-    layout_text = "\n".join(layout_lines)
-
-    # Add a legend at the end
-    legend = "\nLegend:\n"
-    if dice_type == 'Colored Dice':
-        for color in selected_colors:
-            legend += f"{color[:3].capitalize()} - {color.capitalize()} Dice\n"
-    else:
-        if dice_option_var.get() == 'Combined Dice':
-            legend += "Bla - Black Dice\n"
-            legend += "Whi - White Dice\n"
-            legend += "S - Solid Face\n"
-            legend += "1 to 6 - Dice Face with that Number\n"
-        else:
-            color = dice_option_var.get().split()[0]
-            legend += f"{color[:3]} - {color} Dice\n"
-            legend += "S - Solid Face\n"
-            legend += "1 to 6 - Dice Face with that Number\n"
-
-    layout_text += legend
-
-    # Update the total dice label
-    total_dice_label.config(text=total_dice_text)
-
-    return layout_text
-
-
 def save_layout():
     """Function to save the dice layout to a text file."""
     if not dice_layout_text:
@@ -445,6 +271,8 @@ def save_layout_to_excel():
     file_path = filedialog.asksaveasfilename(defaultextension='.xlsx', filetypes=[('Excel files', '*.xlsx')])
     if file_path:
         try:
+            from openpyxl import Workbook
+
             wb = Workbook()
             ws = wb.active
 
@@ -645,5 +473,8 @@ buttons_frame.columnconfigure(0, weight=1)
 buttons_frame.columnconfigure(1, weight=1)
 buttons_frame.columnconfigure(2, weight=1)
 
+# Warm the image libraries and sprites once the window has been drawn
+root.bind('<Expose>', on_first_expose)
+
 # Start the GUI main loop
 root.mainloop()
@@ -0,0 +1,277 @@
+import functools
+import math
+import os
+
+import numpy as np
+from PIL import Image
+
+# Constants
+INCHES_PER_FOOT = 12
+DICE_FACE_SIZE_PX = 16  # Size of each die in the rendered mosaic
+ASPECT_RATIO_TOLERANCE = 0.1  # Allowable difference in aspect ratio
+MAX_DICE = 250000  # Largest grid rendered, e.g. about 26 x 26 ft of standard dice
+ASSET_DIR = os.path.dirname(os.path.abspath(__file__))
+
+# Dice size options shown in the GUI, mapped to their size in inches
+DICE_SIZES = {
+    'Standard Dice (0.625")': 0.625,
+    'Mini Dice (0.27")': 0.27,
+    'Micro Dice (0.19685")': 0.19685,  # 5 mm in inches
+}
+
+DICE_TYPES = ('Monochrome Dice', 'Colored Dice')
+DICE_OPTIONS = ('White Dice', 'Black Dice', 'Combined Dice')
+DICE_COLORS = ('white', 'black', 'red', 'blue', 'yellow')
+
+
+def floyd_steinberg_dithering(img_array):
+    """Applies Floyd-Steinberg dithering to the image array."""
+    height, width = img_array.shape
+    new_img = img_array.astype(float)
+
+    for y in range(height):
+        for x in range(width):
+            old_pixel = new_img[y, x]
+            new_pixel = np.round(old_pixel / 32) * 32  # Quantize to 8 levels (0-7)
+            quant_error = old_pixel - new_pixel
+            new_img[y, x] = new_pixel
+
+            if x + 1 < width:
+                new_img[y, x + 1] += quant_error * 7 / 16
+            if x - 1 >= 0 and y + 1 < height:
+                new_img[y + 1, x - 1] += quant_error * 3 / 16
+            if y + 1 < height:
+                new_img[y + 1, x] += quant_error * 5 / 16
+            if x + 1 < width and y + 1 < height:
+                new_img[y + 1, x + 1] += quant_error * 1 / 16
+
+    # Normalize new_img to 0-7
+    dice_values = np.floor(new_img / 32).astype(int)
+    dice_values = np.clip(dice_values, 0, 7)
+    return dice_values
+
+
+def map_grayscale_to_colors(dice_values, selected_colors):
+    """Map dice values to colors based on grayscale intensity."""
+    # Define perceived brightness for each color
+    color_brightness = {
+        'black': 0,
+        'red': 76,
+        'blue': 29,
+        'yellow': 225,
+        'white': 255
+    }
+
+    # Filter brightness for selected colors
+    selected_brightness = {color: color_brightness[color] for color in selected_colors}
+    # Sort colors by brightness
+    sorted_colors = sorted(selected_brightness, key=selected_brightness.get)
+    num_colors = len(sorted_colors)
+
+    # Map dice values to color indices
+    color_indices = (dice_values / 7 * (num_colors - 1)).astype(int)
+    color_indices = np.clip(color_indices, 0, num_colors - 1)
+
+    # Create a color map
+    color_map = {i: sorted_colors[i] for i in range(num_colors)}
+    # Map to colors
+    color_mapped_values = np.vectorize(color_map.get)(color_indices)
+    return color_mapped_values
+
+
+def validate_options(physical_width_ft, physical_height_ft, dice_type, dice_option,
+                     dice_size_option, selected_colors):
+    """Check the generation options, raising ValueError with a user-facing message."""
+    dimensions = (physical_width_ft, physical_height_ft)
+    if not all(math.isfinite(dimension) and dimension > 0 for dimension in dimensions):
+        raise ValueError("Please enter valid physical dimensions.")
+    if dice_type not in DICE_TYPES:
+        raise ValueError("Invalid dice type selected.")
+    if dice_type == 'Monochrome Dice' and dice_option not in DICE_OPTIONS:
+        raise ValueError("Invalid dice option selected.")
+    if dice_type == 'Colored Dice':
+        if not selected_colors:
+            raise ValueError("Please select at least one dice color.")
+        unknown = [color for color in selected_colors if color not in DICE_COLORS]
+        if unknown:
+            raise ValueError(f"Unknown dice colors: {', '.join(unknown)}")
+    if dice_size_option not in DICE_SIZES:
+        raise ValueError("Invalid dice size selected.")
+    num_dice_horizontal, num_dice_vertical = grid_size(
+        physical_width_ft, physical_height_ft, dice_size_option)
+    if num_dice_horizontal * num_dice_vertical > MAX_DICE:
+        raise ValueError(f"The image would need {num_dice_horizontal * num_dice_vertical} dice; "
+                         f"the maximum is {MAX_DICE}. Please enter smaller physical dimensions.")
+
+
+def grid_size(physical_width_ft, physical_height_ft, dice_size_option):
+    """Return the number of dice horizontally and vertically for the physical size."""
+    dice_size_inches = DICE_SIZES[dice_size_option]
+    physical_width_in = physical_width_ft * INCHES_PER_FOOT
+    physical_height_in = physical_height_ft * INCHES_PER_FOOT
+    num_dice_horizontal = int(round(physical_width_in / dice_size_inches))
+    num_dice_vertical = int(round(physical_height_in / dice_size_inches))
+    return num_dice_horizontal, num_dice_vertical
+
+
+def aspect_ratio_mismatch(image_size, physical_width_ft, physical_height_ft):
+    """Return True when the image aspect ratio differs from the physical one."""
+    image_width, image_height = image_size
+    image_aspect_ratio = image_width / image_height
+    desired_aspect_ratio = physical_width_ft / physical_height_ft
+    return abs(image_aspect_ratio - desired_aspect_ratio) > ASPECT_RATIO_TOLERANCE
+
+
+@functools.lru_cache(maxsize=None)
+def load_dice_sprites(color, size_px=DICE_FACE_SIZE_PX):
+    """Load and resize the face and solid sprites for one dice color.
+
+    The result is cached per process, so repeated renders reuse the resized
+    sprites instead of reopening the PNG assets.
+    """
+    folder = os.path.join(ASSET_DIR, f'dice_{color}')
+    sprites = {}
+    for i in range(1, 7):
+        with Image.open(os.path.join(folder, f'{i}.png')) as face:
+            sprites[str(i)] = face.convert('RGB').resize((size_px, size_px), Image.LANCZOS)
+    with Image.open(os.path.join(folder, f'solid_{color}.png')) as solid:
+        sprites['solid'] = solid.convert('RGB').resize((size_px, size_px), Image.LANCZOS)
+    return sprites
+
+
+def warm_sprite_cache(size_px=DICE_FACE_SIZE_PX):
+    """Load the sprites for every dice color into the cache."""
+    for color in DICE_COLORS:
+        load_dice_sprites(color, size_px)
+
+
+def compute_dice_grid(img, num_dice_horizontal, num_dice_vertical, dice_type,
+                      dice_option, selected_colors):
+    """Dither the image down to the dice grid and pick a color for every die."""
+    # Convert image to grayscale and resize it to one pixel per die
+    img = img.convert('L')
+    img = img.resize((num_dice_horizontal, num_dice_vertical), Image.LANCZOS)
+    img_array = np.array(img)
+
+    # Apply dithering
+    dice_values = floyd_steinberg_dithering(img_array)
+
+    if dice_type == 'Colored Dice':
+        # Map grayscale values to selected colors
+        dice_colors = map_grayscale_to_colors(dice_values, selected_colors)
+    elif dice_option == 'Combined Dice':
+        # Map grayscale values to black and white based on thresholds
+        dice_colors = np.where(dice_values <= 3, 'black', 'white')
+    else:
+        dice_colors = np.full(dice_values.shape, dice_option.lower().split()[0])  # e.g., 'white' or 'black'
+
+    return dice_values, dice_colors
+
+
+def select_face(dice_value, dice_type):
+    """Return the sprite key ('1' to '6' or 'solid') used for a dithered value."""
+    if dice_type == 'Colored Dice':
+        # Map grayscale intensity to dice face value (1-6)
+        return str(dice_value % 6 + 1)
+    if dice_value == 0 or dice_value == 7:
+        return 'solid'
+    return str(dice_value)
+
+
+def render_dice_mosaic(dice_values, dice_colors, dice_type, size_px=DICE_FACE_SIZE_PX):
+    """Paste a sprite for every die and return the mosaic with the face labels."""
+    num_dice_vertical, num_dice_horizontal = dice_values.shape
+    dice_faces = np.empty(dice_values.shape, dtype=object)
+    output_img = Image.new('RGB', (num_dice_horizontal * size_px, num_dice_vertical * size_px))
+
+    for y in range(num_dice_vertical):
+        for x in range(num_dice_horizontal):
+            color = str(dice_colors[y, x])
+            sprites = load_dice_sprites(color, size_px)
+            face = select_face(int(dice_values[y, x]), dice_type)
+
+            label = 'S' if face == 'solid' else face
+            dice_faces[y, x] = f"{color[:3].capitalize()}{label}"
+            output_img.paste(sprites[face], (x * size_px, y * size_px))
+
+    return output_img, dice_faces
+
+
+def count_dice(dice_colors):
+    """Count the number of dice for each color."""
+    unique_colors, counts = np.unique(dice_colors, return_counts=True)
+    return {str(color): int(count) for color, count in zip(unique_colors, counts)}
+
+
+def build_layout_text(dice_faces, dice_type, dice_option, selected_colors):
+    """Build the dice layout grid text with its legend."""
+    num_dice_horizontal = dice_faces.shape[1]
+    layout_lines = []
+
+    # Header row with column numbers
+    header = "    |" + "|".join(f"{col:>5}" for col in range(1, num_dice_horizontal + 1)) + "|"
+    separator = "----" + "+-----" * num_dice_horizontal + "+"
+    layout_lines.append(header)
+    layout_lines.append(separator)
+
+    for idx, row in enumerate(dice_faces):
+        row_num = f"{idx + 1:>3} |"
+        row_values = "|".join(f"{val:>5}" for val in row)
+        layout_lines.append(f"{row_num}{row_values}|")
+        layout_lines.append(separator)
+
+    layout_text = "\n".join(layout_lines)
+
+    # Add a legend at the end
+    legend = "\nLegend:\n"
+    if dice_type == 'Colored Dice':
+        for color in selected_colors:
+            legend += f"{color[:3].capitalize()} - {color.capitalize()} Dice\n"
+    elif dice_option == 'Combined Dice':
+        legend += "Bla - Black Dice\n"
+        legend += "Whi - White Dice\n"
+        legend += "S - Solid Face\n"
+        legend += "1 to 6 - Dice Face with that Number\n"
+    else:
+        color = dice_option.split()[0]
+        legend += f"{color[:3]} - {color} Dice\n"
+        legend += "S - Solid Face\n"
+        legend += "1 to 6 - Dice Face with that Number\n"
+
+    return layout_text + legend
+
+
+def build_total_text(color_counts):
+    """Build the summary of the total number of dice needed per color."""
+    total_dice = sum(color_counts.values())
+    total_dice_text = f"Total number of dice needed: {total_dice}\n"
+    for color, count in color_counts.items():
+        total_dice_text += f"  {color.capitalize()} dice: {count}\n"
+    return total_dice_text
+
+
+def generate_mosaic(img, physical_width_ft, physical_height_ft, dice_type, dice_option,
+                    dice_size_option, selected_colors):
+    """Run the full pipeline on an opened image without any GUI.
+
+    Returns a dict with the rendered ``mosaic`` image, the ``layout_text``,
+    the per-color ``counts``, the ``total_text`` summary and the grid size.
+    Raises ValueError for invalid options.
+    """
+    validate_options(physical_width_ft, physical_height_ft, dice_type, dice_option,
+                     dice_size_option, selected_colors)
+    num_dice_horizontal, num_dice_vertical = grid_size(
+        physical_width_ft, physical_height_ft, dice_size_option)
+
+    dice_values, dice_colors = compute_dice_grid(
+        img, num_dice_horizontal, num_dice_vertical, dice_type, dice_option, selected_colors)
+    output_img, dice_faces = render_dice_mosaic(dice_values, dice_colors, dice_type)
+    color_counts = count_dice(dice_colors)
+
+    return {
+        'mosaic': output_img,
+        'layout_text': build_layout_text(dice_faces, dice_type, dice_option, selected_colors),
+        'counts': color_counts,
+        'total_text': build_total_text(color_counts),
+        'grid': (num_dice_horizontal, num_dice_vertical),
+    }
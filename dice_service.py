@@ -0,0 +1,366 @@
+"""Local HTTP render service for the dice image generator.
+
+Runs the generate pipeline as jobs so several workstations can share one
+set of warm sprite caches and recent results:
+
+    python dice_service.py --port 8765 --workers 2
+
+Endpoints:
+    POST /jobs              submit an image and options, returns the job id
+    GET  /jobs/<id>         job status
+    GET  /jobs/<id>/mosaic  rendered mosaic as PNG
+    GET  /jobs/<id>/layout  dice layout text
+    GET  /jobs/<id>/counts  dice counts per color
+    GET  /health            service status
+
+The request body for POST /jobs is JSON with a base64 encoded ``image`` and
+the options ``width_ft``, ``height_ft``, ``dice_type``, ``dice_option``,
+``dice_size`` and ``colors``. Identical submissions share a single job.
+"""
+import argparse
+import asyncio
+import base64
+import collections
+import hashlib
+import io
+import json
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+DEFAULT_HOST = '127.0.0.1'
+DEFAULT_PORT = 8765
+MAX_BODY_BYTES = 32 * 1024 * 1024
+REQUEST_TIMEOUT = 10  # Seconds; the service runs on the same machine or network
+POLL_INTERVAL = 0.2  # Seconds between job status checks
+JOB_TIMEOUT = 300  # Seconds a client waits for a job before giving up
+STATUS_REASONS = {
+    200: 'OK', 202: 'Accepted', 400: 'Bad Request', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large',
+    500: 'Internal Server Error', 503: 'Service Unavailable',
+}
+
+
+def render_job(image_bytes, params):
+    """Run the pipeline for one job inside a worker process."""
+    from PIL import Image
+
+    import dice_pipeline
+
+    with Image.open(io.BytesIO(image_bytes)) as img:
+        result = dice_pipeline.generate_mosaic(img, **params)
+
+    buffer = io.BytesIO()
+    result['mosaic'].save(buffer, format='PNG')
+    result['mosaic'] = buffer.getvalue()
+    return result
+
+
+def parse_job_request(payload):
+    """Turn a POST /jobs payload into image bytes and pipeline parameters."""
+    import dice_pipeline
+
+    if not isinstance(payload, dict):
+        raise ValueError("Invalid job request: expected a JSON object")
+    colors = payload.get('colors', [])
+    if not isinstance(colors, list) or not all(isinstance(color, str) for color in colors):
+        raise ValueError("Invalid job request: colors must be a list of color names")
+    for field in ('dice_type', 'dice_option', 'dice_size'):
+        if not isinstance(payload.get(field, ''), str):
+            raise ValueError(f"Invalid job request: {field} must be a string")
+
+    try:
+        image_bytes = base64.b64decode(payload['image'], validate=True)
+        params = {
+            'physical_width_ft': float(payload['width_ft']),
+            'physical_height_ft': float(payload['height_ft']),
+            'dice_type': payload.get('dice_type', 'Monochrome Dice'),
+            'dice_option': payload.get('dice_option', 'White Dice'),
+            'dice_size_option': payload.get('dice_size', 'Standard Dice (0.625")'),
+            'selected_colors': colors,
+        }
+    except (KeyError, TypeError, ValueError) as e:
+        raise ValueError(f"Invalid job request: {e}")
+
+    dice_pipeline.validate_options(**params)
+    return image_bytes, params
+
+
+def job_key(image_bytes, params):
+    """Return the id shared by every submission of the same image and options."""
+    digest = hashlib.sha256(image_bytes)
+    digest.update(json.dumps(params, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()[:32]
+
+
+class RenderService:
+    """Job queue in front of a process pool, with a bounded cache of results."""
+
+    def __init__(self, workers=2, queue_size=16, max_results=32):
+        self.workers = workers
+        self.max_results = max_results
+        self.jobs = collections.OrderedDict()  # job id -> job record, oldest first
+        self.queue = asyncio.Queue(maxsize=queue_size)
+        self.pool = None
+        self.consumers = []
+
+    def _new_pool(self):
+        import dice_pipeline
+
+        # Each worker process loads every sprite once, before its first job
+        return ProcessPoolExecutor(max_workers=self.workers, initializer=dice_pipeline.warm_sprite_cache)
+
+    async def start(self):
+        self.pool = self._new_pool()
+        self.consumers = [asyncio.create_task(self._consume()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for consumer in self.consumers:
+            consumer.cancel()
+        await asyncio.gather(*self.consumers, return_exceptions=True)
+        self.pool.shutdown(cancel_futures=True)
+
+    def submit(self, image_bytes, params):
+        """Queue a job, or return the existing one for an identical request."""
+        job_id = job_key(image_bytes, params)
+        job = self.jobs.get(job_id)
+        if job is not None and job['status'] != 'failed':
+            self.jobs.move_to_end(job_id)
+            return job, False
+
+        job = {'id': job_id, 'status': 'queued', 'error': None, 'result': None}
+        self.queue.put_nowait((job, image_bytes, params))  # raises QueueFull
+        self.jobs[job_id] = job
+        self._evict()
+        return job, True
+
+    def _evict(self):
+        # Drop the oldest finished jobs once the cache is over its limit
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job['status'] in ('done', 'failed')]
+        for job_id in finished[:max(0, len(self.jobs) - self.max_results)]:
+            del self.jobs[job_id]
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            job, image_bytes, params = await self.queue.get()
+            job['status'] = 'running'
+            pool = self.pool
+            try:
+                job['result'] = await loop.run_in_executor(pool, render_job, image_bytes, params)
+                job['status'] = 'done'
+            except BrokenProcessPool:
+                # A worker died, e.g. killed for running out of memory; the pool
+                # refuses all further work, so replace it unless another
+                # consumer already has
+                job['error'] = 'The render worker stopped unexpectedly'
+                job['status'] = 'failed'
+                if self.pool is pool:
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    self.pool = self._new_pool()
+            except Exception as e:
+                job['error'] = str(e)
+                job['status'] = 'failed'
+            finally:
+                self.queue.task_done()
+                self._evict()
+
+    async def handle(self, reader, writer):
+        """Serve a single HTTP request on the connection."""
+        try:
+            status, content_type, body = await self._dispatch(reader)
+        except Exception:
+            status, content_type, body = _json_response(500, {'error': 'Internal server error'})
+        head = (f"HTTP/1.1 {status} {STATUS_REASONS.get(status, '')}\r\n"
+                f"Content-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\n"
+                f"Connection: close\r\n\r\n")
+        writer.write(head.encode('latin-1') + body)
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass  # The client went away before reading the response
+        finally:
+            writer.close()
+
+    async def _dispatch(self, reader):
+        request_line = (await reader.readline()).decode('latin-1').split()
+        if len(request_line) < 2:
+            return _json_response(400, {'error': 'Malformed request line'})
+        method, path = request_line[0], request_line[1].split('?')[0]
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode('latin-1').strip()
+            if not line:
+                break
+            name, _, value = line.partition(':')
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get('content-length', 0))
+        except ValueError:
+            return _json_response(400, {'error': 'Invalid Content-Length header'})
+        if length < 0:
+            return _json_response(400, {'error': 'Invalid Content-Length header'})
+        if length > MAX_BODY_BYTES:
+            return _json_response(413, {'error': 'Request body too large'})
+        try:
+            body = await reader.readexactly(length) if length else b''
+        except asyncio.IncompleteReadError:
+            return _json_response(400, {'error': 'Request body is shorter than Content-Length'})
+
+        parts = [part for part in path.split('/') if part]
+        if parts == ['health']:
+            return _json_response(200, {'status': 'ok', 'jobs': len(self.jobs),
+                                        'queued': self.queue.qsize()})
+        if parts == ['jobs']:
+            if method != 'POST':
+                return _json_response(405, {'error': 'Use POST to submit a job'})
+            return self._post_job(body)
+        if len(parts) in (2, 3) and parts[0] == 'jobs':
+            if method != 'GET':
+                return _json_response(405, {'error': 'Use GET to read a job'})
+            return self._get_job(parts[1], parts[2] if len(parts) == 3 else None)
+        return _json_response(404, {'error': f'No route for {path}'})
+
+    def _post_job(self, body):
+        try:
+            image_bytes, params = parse_job_request(json.loads(body))
+        except ValueError as e:
+            return _json_response(400, {'error': str(e)})
+        try:
+            job, created = self.submit(image_bytes, params)
+        except asyncio.QueueFull:
+            return _json_response(503, {'error': 'Job queue is full, try again later'})
+        return _json_response(202 if created else 200, _job_status(job))
+
+    def _get_job(self, job_id, resource):
+        job = self.jobs.get(job_id)
+        if job is None:
+            return _json_response(404, {'error': f'Unknown job {job_id}'})
+        if resource is None:
+            return _json_response(200, _job_status(job))
+        if job['status'] != 'done':
+            return _json_response(409, _job_status(job))
+
+        result = job['result']
+        if resource == 'mosaic':
+            return 200, 'image/png', result['mosaic']
+        if resource == 'layout':
+            return 200, 'text/plain; charset=utf-8', result['layout_text'].encode('utf-8')
+        if resource == 'counts':
+            return _json_response(200, {'counts': result['counts'], 'total_text': result['total_text'],
+                                        'grid': result['grid']})
+        return _json_response(404, {'error': f'Unknown job resource {resource}'})
+
+
+def _job_status(job):
+    return {'id': job['id'], 'status': job['status'], 'error': job['error']}
+
+
+def _json_response(status, payload):
+    return status, 'application/json', json.dumps(payload).encode('utf-8')
+
+
+async def serve(host=DEFAULT_HOST, port=DEFAULT_PORT, workers=2, queue_size=16, max_results=32):
+    """Run the render service until cancelled."""
+    service = RenderService(workers=workers, queue_size=queue_size, max_results=max_results)
+    await service.start()
+    server = await asyncio.start_server(service.handle, host, port)
+    print(f"Dice render service listening on http://{host}:{port}")
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await service.stop()
+
+
+# Client helpers used by the GUI when a service URL is configured
+
+class JobNotFound(RuntimeError):
+    """The service does not know the job, e.g. because its result was evicted."""
+
+
+def _request(url, data=None, timeout=REQUEST_TIMEOUT):
+    headers = {'Content-Type': 'application/json'} if data is not None else {}
+    request = urllib.request.Request(url, data=data, headers=headers)
+    try:
+        with urllib.request.urlopen(request, timeout=timeout) as response:
+            return response.read()
+    except urllib.error.HTTPError as e:
+        try:
+            message = json.loads(e.read()).get('error') or e.reason
+        except ValueError:
+            message = e.reason
+        if e.code == 404:
+            raise JobNotFound(message)
+        raise RuntimeError(f"Render service error: {message}")
+
+
+def submit_job(base_url, image_path, width_ft, height_ft, dice_type, dice_option, dice_size, colors):
+    """Submit an image to the service and return the job status."""
+    with open(image_path, 'rb') as file:
+        image = base64.b64encode(file.read()).decode('ascii')
+    payload = {
+        'image': image, 'width_ft': width_ft, 'height_ft': height_ft,
+        'dice_type': dice_type, 'dice_option': dice_option,
+        'dice_size': dice_size, 'colors': list(colors),
+    }
+    return json.loads(_request(f"{base_url.rstrip('/')}/jobs", json.dumps(payload).encode('utf-8')))
+
+
+def get_job(base_url, job_id):
+    """Return the status of a job."""
+    return json.loads(_request(f"{base_url.rstrip('/')}/jobs/{job_id}"))
+
+
+def fetch_result(base_url, job_id):
+    """Fetch the mosaic PNG bytes, layout text and counts of a finished job."""
+    job_url = f"{base_url.rstrip('/')}/jobs/{job_id}"
+    mosaic = _request(f"{job_url}/mosaic")
+    layout_text = _request(f"{job_url}/layout").decode('utf-8')
+    counts = json.loads(_request(f"{job_url}/counts"))
+    return mosaic, layout_text, counts
+
+
+def run_job(base_url, image_path, width_ft, height_ft, dice_type, dice_option, dice_size, colors,
+            timeout=JOB_TIMEOUT):
+    """Submit a job, wait for it to finish and return fetch_result() for it.
+
+    Blocks until the job is done, so the GUI calls it from a worker thread.
+    Raises OSError when the service cannot be reached, JobNotFound when the
+    result was evicted before it could be fetched and RuntimeError when the
+    job fails or is not done within ``timeout`` seconds.
+    """
+    deadline = time.monotonic() + timeout
+    job = submit_job(base_url, image_path, width_ft, height_ft, dice_type, dice_option, dice_size, colors)
+    while job['status'] in ('queued', 'running'):
+        if time.monotonic() > deadline:
+            raise RuntimeError(f"The job did not finish within {timeout} seconds")
+        time.sleep(POLL_INTERVAL)
+        job = get_job(base_url, job['id'])
+    if job['status'] == 'failed':
+        raise RuntimeError(job['error'])
+    return fetch_result(base_url, job['id'])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local render service for the dice image generator.")
+    parser.add_argument('--host', default=DEFAULT_HOST)
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--workers', type=int, default=2, help="Size of the render process pool")
+    parser.add_argument('--queue-size', type=int, default=16, help="Maximum number of queued jobs")
+    parser.add_argument('--max-results', type=int, default=32, help="Number of finished jobs kept in memory")
+    args = parser.parse_args()
+    try:
+        asyncio.run(serve(args.host, args.port, args.workers, args.queue_size, args.max_results))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
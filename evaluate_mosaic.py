@@ -0,0 +1,364 @@
+"""Quality-vs-speed evaluation of the dice mosaic pipeline.
+
+Runs a fixed corpus of synthetic images (plus any sample images given on the
+command line) through the generate pipeline with every dice mode, renders
+each result back to luminance at grid resolution and compares it with the
+grayscale target the pipeline dithered:
+
+    python evaluate_mosaic.py --images photo.jpg --output-dir evaluation_results
+
+Each die is rendered as the mean brightness of its full size sprite from the
+dice_<color>/ folders. For every image and mode the harness reports runtime,
+peak memory and the MSE, SSIM and tone-curve error, and writes the table to
+evaluation.json and evaluation.md.
+
+Peak memory is the peak resident set size of a fresh interpreter that runs
+the pipeline once, so native allocations such as PIL image buffers count.
+Where the resource module is missing (Windows) it falls back to the
+tracemalloc peak plus the size of the mosaic buffer.
+"""
+import argparse
+import functools
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+import dice_pipeline
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+MIB = 1024 * 1024
+SYNTHETIC_SIZE = 256
+TONE_BINS = 16
+
+# mode name -> (dice type, dice option, selected colors)
+MODES = {
+    'white': ('Monochrome Dice', 'White Dice', []),
+    'black': ('Monochrome Dice', 'Black Dice', []),
+    'combined': ('Monochrome Dice', 'Combined Dice', []),
+    'colored': ('Colored Dice', '', list(dice_pipeline.DICE_COLORS)),
+}
+
+
+def synthetic_corpus(size=SYNTHETIC_SIZE):
+    """Return the fixed synthetic test images as grayscale PIL images."""
+    ramp = np.linspace(0, 255, size)
+    yy, xx = np.mgrid[0:size, 0:size]
+    center = (size - 1) / 2
+    radius = np.hypot(xx - center, yy - center) / np.hypot(center, center)
+
+    shapes = Image.new('L', (size, size), color=40)
+    draw = ImageDraw.Draw(shapes)
+    draw.rectangle([size // 8, size // 8, size // 2, size // 2], fill=200)
+    draw.ellipse([size // 3, size // 3, size - size // 8, size - size // 8], fill=120)
+    draw.line([0, size - 1, size - 1, 0], fill=255, width=max(1, size // 32))
+
+    rng = np.random.default_rng(0)
+    noise = Image.fromarray(rng.integers(0, 256, (size // 16, size // 16), dtype=np.uint8))
+
+    arrays = {
+        'gradient': np.tile(ramp, (size, 1)),
+        'radial': 255 * (1 - np.clip(radius, 0, 1)),
+        'stripes': 127.5 + 127.5 * np.sin(xx / size * 2 * np.pi * 12),
+        'checker': 255 * (((xx // (size // 8)) + (yy // (size // 8))) % 2),
+        'flat_mid': np.full((size, size), 128),
+    }
+    corpus = {name: Image.fromarray(array.astype(np.uint8)) for name, array in arrays.items()}
+    corpus['shapes'] = shapes
+    corpus['smooth_noise'] = noise.resize((size, size), Image.BICUBIC)
+    return corpus
+
+
+@functools.lru_cache(maxsize=None)
+def face_luminance(color, face):
+    """Return the mean brightness (0-255) of a full size dice sprite."""
+    name = f'solid_{color}.png' if face == 'solid' else f'{face}.png'
+    with Image.open(os.path.join(dice_pipeline.ASSET_DIR, f'dice_{color}', name)) as sprite:
+        return float(np.asarray(sprite.convert('L'), dtype=float).mean())
+
+
+def render_luminance(dice_values, dice_colors, dice_type):
+    """Render the dice grid back to luminance, one value per die."""
+    luminance = np.empty(dice_values.shape, dtype=float)
+    for (y, x), dice_value in np.ndenumerate(dice_values):
+        face = dice_pipeline.select_face(int(dice_value), dice_type)
+        luminance[y, x] = face_luminance(str(dice_colors[y, x]), face)
+    return luminance
+
+
+def mse(target, rendered):
+    """Mean squared error on the 0-255 scale."""
+    return float(np.mean((target - rendered) ** 2))
+
+
+def _box_mean(array, window):
+    # Mean over every window x window patch (valid positions only)
+    summed = np.pad(array, ((1, 0), (1, 0))).cumsum(axis=0).cumsum(axis=1)
+    patch = (summed[window:, window:] - summed[:-window, window:]
+             - summed[window:, :-window] + summed[:-window, :-window])
+    return patch / (window * window)
+
+
+def ssim(target, rendered, data_range=255.0, window=7):
+    """Mean structural similarity using a uniform window."""
+    window = min(window, *target.shape)
+    n = window * window
+    cov_norm = n / (n - 1) if n > 1 else 1.0
+
+    mean_t = _box_mean(target, window)
+    mean_r = _box_mean(rendered, window)
+    var_t = cov_norm * (_box_mean(target * target, window) - mean_t ** 2)
+    var_r = cov_norm * (_box_mean(rendered * rendered, window) - mean_r ** 2)
+    cov = cov_norm * (_box_mean(target * rendered, window) - mean_t * mean_r)
+
+    c1 = (0.01 * data_range) ** 2
+    c2 = (0.03 * data_range) ** 2
+    ssim_map = ((2 * mean_t * mean_r + c1) * (2 * cov + c2)
+                / ((mean_t ** 2 + mean_r ** 2 + c1) * (var_t + var_r + c2)))
+    return float(ssim_map.mean())
+
+
+def tone_curve(target, rendered, bins=TONE_BINS):
+    """Return the tone curve and its error.
+
+    Dice are grouped by target brightness; the curve holds the mean target
+    and mean rendered brightness of each group. The error is the RMS gap
+    between the two, weighted by the number of dice in each group.
+    """
+    indices = np.clip((target / 256 * bins).astype(int), 0, bins - 1).ravel()
+    counts = np.bincount(indices, minlength=bins)
+    target_sums = np.bincount(indices, weights=target.ravel(), minlength=bins)
+    rendered_sums = np.bincount(indices, weights=rendered.ravel(), minlength=bins)
+
+    used = counts > 0
+    target_means = target_sums[used] / counts[used]
+    rendered_means = rendered_sums[used] / counts[used]
+    error = np.sqrt(np.sum(counts[used] * (rendered_means - target_means) ** 2) / counts.sum())
+    curve = [[round(float(t), 2), round(float(r), 2)] for t, r in zip(target_means, rendered_means)]
+    return curve, float(error)
+
+
+def run_pipeline(img, grid, dice_type, dice_option, selected_colors):
+    """Run the generate pipeline steps and return the dithered values, colors and mosaic."""
+    dice_values, dice_colors = dice_pipeline.compute_dice_grid(
+        img, grid[0], grid[1], dice_type, dice_option, selected_colors)
+    mosaic, dice_faces = dice_pipeline.render_dice_mosaic(dice_values, dice_colors, dice_type)
+    dice_pipeline.build_layout_text(dice_faces, dice_type, dice_option, selected_colors)
+    return dice_values, dice_colors, mosaic
+
+
+def _peak_rss_bytes():
+    # ru_maxrss is in kilobytes on Linux and in bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _proc_status_bytes(field):
+    # Read a memory field such as VmRSS or VmHWM from /proc/self/status (Linux)
+    with open('/proc/self/status') as file:
+        for line in file:
+            if line.startswith(field + ':'):
+                return int(line.split()[1]) * 1024
+    raise OSError(f"{field} missing from /proc/self/status")
+
+
+def _reset_peak_rss():
+    # Reset the kernel's peak RSS counter so it only covers what follows (Linux)
+    try:
+        with open('/proc/self/clear_refs', 'w') as file:
+            file.write('5')
+        _proc_status_bytes('VmHWM')
+    except OSError:
+        return False
+    return True
+
+
+def memory_child(img, grid, mode):
+    """Run the pipeline once in this fresh interpreter and return its peak RSS in bytes.
+
+    Also returns the RSS before the pipeline ran, i.e. the cost of the
+    interpreter, imports, the input image and the sprites. Where the peak
+    cannot be reset, the pre-run value is the peak so far, and pipeline
+    allocations that stay below it are not visible.
+    """
+    dice_pipeline.warm_sprite_cache()
+    if _reset_peak_rss():
+        baseline = _proc_status_bytes('VmRSS')
+        run_pipeline(img, grid, *MODES[mode])
+        return _proc_status_bytes('VmHWM'), baseline
+
+    baseline = _peak_rss_bytes()
+    run_pipeline(img, grid, *MODES[mode])
+    return _peak_rss_bytes(), baseline
+
+
+def measure_memory(name, img, grid, mode, args):
+    """Return the peak memory of one pipeline run and how much of it is above the baseline, in MiB."""
+    if resource is None:
+        # tracemalloc does not see PIL buffers, so add the mosaic explicitly
+        tracemalloc.start()
+        try:
+            _, _, mosaic = run_pipeline(img, grid, *MODES[mode])
+            _, peak_bytes = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        peak_bytes += mosaic.width * mosaic.height * len(mosaic.getbands())
+        return peak_bytes / MIB, peak_bytes / MIB
+
+    command = [sys.executable, os.path.abspath(__file__), '--memory-child', name, mode,
+               '--width-ft', repr(args.width_ft), '--height-ft', repr(args.height_ft),
+               '--dice-size', args.dice_size]
+    completed = subprocess.run(command, capture_output=True, text=True, check=True)
+    peak_bytes, baseline_bytes = json.loads(completed.stdout.strip().splitlines()[-1])
+    return peak_bytes / MIB, (peak_bytes - baseline_bytes) / MIB
+
+
+def evaluate(img, grid, mode, repeats):
+    """Measure the runtime and fidelity of one image in one mode."""
+    dice_type, dice_option, selected_colors = MODES[mode]
+
+    runtimes = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        dice_values, dice_colors, _ = run_pipeline(img, grid, dice_type, dice_option, selected_colors)
+        runtimes.append(time.perf_counter() - start)
+
+    target = np.asarray(img.convert('L').resize(grid, Image.LANCZOS), dtype=float)
+    rendered = render_luminance(dice_values, dice_colors, dice_type)
+    curve, tone_error = tone_curve(target, rendered)
+
+    return {
+        'runtime_s': statistics.median(runtimes),
+        'mse': mse(target, rendered),
+        'ssim': ssim(target, rendered),
+        'tone_curve_error': tone_error,
+        'tone_curve': curve,
+    }
+
+
+def summarize(results):
+    """Average every metric per mode across the corpus."""
+    summary = {}
+    for mode in MODES:
+        rows = [row for row in results if row['mode'] == mode]
+        summary[mode] = {
+            metric: statistics.mean(row[metric] for row in rows)
+            for metric in ('runtime_s', 'peak_memory_mib', 'memory_above_baseline_mib',
+                           'mse', 'ssim', 'tone_curve_error')
+        }
+    return summary
+
+
+def to_markdown(report):
+    """Format the report as Markdown tables."""
+    grid = report['grid']
+    lines = [
+        "# Dice mosaic evaluation",
+        "",
+        f"Grid: {grid[0]} x {grid[1]} dice, median of {report['repeats']} runs. "
+        f"Peak memory: {report['memory_method']}.",
+        "",
+        "## Mean per mode",
+        "",
+        "| Mode | Runtime (ms) | Peak memory (MiB) | Above baseline (MiB) | MSE | SSIM | Tone-curve error |",
+        "|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for mode, row in report['summary'].items():
+        lines.append(f"| {mode} | {row['runtime_s'] * 1000:.1f} | {row['peak_memory_mib']:.2f} | "
+                     f"{row['memory_above_baseline_mib']:.2f} | {row['mse']:.1f} | {row['ssim']:.4f} | "
+                     f"{row['tone_curve_error']:.2f} |")
+
+    lines += [
+        "",
+        "## Per image",
+        "",
+        "| Image | Mode | Runtime (ms) | Peak memory (MiB) | Above baseline (MiB) | MSE | SSIM | Tone-curve error |",
+        "|---|---|---:|---:|---:|---:|---:|---:|",
+    ]
+    for row in report['results']:
+        lines.append(f"| {row['image']} | {row['mode']} | {row['runtime_s'] * 1000:.1f} | "
+                     f"{row['peak_memory_mib']:.2f} | {row['memory_above_baseline_mib']:.2f} | "
+                     f"{row['mse']:.1f} | {row['ssim']:.4f} | {row['tone_curve_error']:.2f} |")
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare quality and speed of the dice mosaic modes.")
+    parser.add_argument('--images', nargs='*', default=[],
+                        help="Sample images to add to the corpus, each named by its path")
+    parser.add_argument('--width-ft', type=float, default=3.0)
+    parser.add_argument('--height-ft', type=float, default=3.0)
+    parser.add_argument('--dice-size', default='Standard Dice (0.625")', choices=list(dice_pipeline.DICE_SIZES))
+    parser.add_argument('--repeats', type=int, default=3, help="Timed runs per image and mode")
+    parser.add_argument('--output-dir', default='evaluation_results')
+    parser.add_argument('--memory-child', nargs=2, metavar=('IMAGE', 'MODE'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.repeats < 1:
+        parser.error("--repeats must be at least 1")
+    if not (args.width_ft > 0 and args.height_ft > 0):
+        parser.error("--width-ft and --height-ft must be greater than 0")
+
+    grid = dice_pipeline.grid_size(args.width_ft, args.height_ft, args.dice_size)
+    if min(grid) < 1:
+        parser.error("the dimensions are too small for a single die")
+
+    if args.memory_child:
+        name, mode = args.memory_child
+        synthetic = synthetic_corpus()
+        if name in synthetic:
+            img = synthetic[name]
+        else:
+            with Image.open(name) as sample:
+                img = sample.convert('L')
+        print(json.dumps(memory_child(img, grid, mode)))
+        return
+
+    corpus = synthetic_corpus()
+    for path in args.images:
+        if path in corpus:
+            parser.error(f"image {path!r} is given twice or clashes with a synthetic image")
+        with Image.open(path) as img:
+            corpus[path] = img.convert('L')
+
+    # Load the sprites up front so the first mode is not charged for it
+    dice_pipeline.warm_sprite_cache()
+
+    results = []
+    for name, img in corpus.items():
+        for mode in MODES:
+            row = {'image': name, 'mode': mode}
+            row.update(evaluate(img, grid, mode, args.repeats))
+            row['peak_memory_mib'], row['memory_above_baseline_mib'] = measure_memory(
+                name, img, grid, mode, args)
+            results.append(row)
+            print(f"{name:<16}{mode:<10}{row['runtime_s'] * 1000:>9.1f} ms  "
+                  f"MSE {row['mse']:>8.1f}  SSIM {row['ssim']:.4f}  tone {row['tone_curve_error']:.2f}")
+
+    if resource is None:
+        memory_method = "tracemalloc peak plus the mosaic buffer, in process"
+    else:
+        memory_method = ("peak RSS of a fresh interpreter running the pipeline once; "
+                         "above baseline is the part added by the pipeline run")
+    report = {'grid': list(grid), 'repeats': args.repeats, 'memory_method': memory_method,
+              'summary': summarize(results), 'results': results}
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    with open(os.path.join(args.output_dir, 'evaluation.json'), 'w') as file:
+        json.dump(report, file, indent=2)
+    with open(os.path.join(args.output_dir, 'evaluation.md'), 'w') as file:
+        file.write(to_markdown(report))
+    print(f"Results written to {args.output_dir}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,128 @@
+"""Cold-start benchmark for the GUI and headless entry points.
+
+Every measurement runs in a fresh interpreter so nothing is cached between
+runs:
+
+    python startup_benchmark.py --runs 5 --json startup_history.jsonl --max-seconds 1.5
+
+Import targets are measured by the wall time of the whole interpreter. The
+GUI is measured from the moment its interpreter is launched to the first
+paint of the window, so interpreter startup and imports count against it as
+they do for the imports; its wall time, which also covers teardown, is shown
+alongside. The GUI needs a
+display. With --max-seconds the script exits with a non-zero status when any
+target is over budget or could not be measured, so a kiosk build cannot pass
+without timing the GUI; --allow-skipped turns skipped targets into a warning.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# name -> (python arguments, extra environment, metric printed by the target or None)
+TARGETS = {
+    'import dice_pipeline': (['-c', 'import dice_pipeline'], {}, None),
+    'import dice_service': (['-c', 'import dice_service'], {}, None),
+    'gui first paint': (['dice_image_generator.py'], {'DICE_EXIT_AFTER_FIRST_PAINT': '1'},
+                        'first_paint_seconds'),
+}
+
+
+def time_run(args, env, metric=None):
+    """Run one fresh interpreter and return its wall time and reported metric.
+
+    Raises RuntimeError with the last line of stderr when the run fails or does
+    not print the expected metric.
+    """
+    # The GUI measures its first paint from this launch timestamp
+    env = dict(os.environ, DICE_LAUNCH_TIME=repr(time.time()), **env)
+    start = time.perf_counter()
+    completed = subprocess.run(
+        [sys.executable] + args, cwd=HERE, env=env,
+        capture_output=True, text=True, timeout=60
+    )
+    elapsed = time.perf_counter() - start
+    if completed.returncode != 0:
+        lines = completed.stderr.strip().splitlines()
+        raise RuntimeError(lines[-1] if lines else f"exit status {completed.returncode}")
+    if metric is None:
+        return elapsed, elapsed
+
+    for line in completed.stdout.splitlines():
+        name, _, value = line.partition('=')
+        if name.strip() == metric:
+            return elapsed, float(value)
+    raise RuntimeError(f"no {metric} line in the output")
+
+
+def run_benchmark(runs):
+    """Time every target and return the min and median of its wall time and metric.
+
+    Targets that could not run map to {'skipped': reason}.
+    """
+    # Interpreter startup on its own, so the targets can be read relative to it
+    baseline = [time_run(['-c', 'pass'], {})[0] for _ in range(runs)]
+    results = {'python startup': {'wall_min': min(baseline), 'wall_median': statistics.median(baseline),
+                                  'min': min(baseline), 'median': statistics.median(baseline)}}
+
+    for name, (args, env, metric) in TARGETS.items():
+        try:
+            timings = [time_run(args, env, metric) for _ in range(runs)]
+        except (RuntimeError, subprocess.TimeoutExpired) as e:
+            results[name] = {'skipped': str(e)}  # e.g. missing display or dependency
+            continue
+        walls = [wall for wall, _ in timings]
+        values = [value for _, value in timings]
+        results[name] = {'wall_min': min(walls), 'wall_median': statistics.median(walls),
+                         'min': min(values), 'median': statistics.median(values)}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the dice image generator.")
+    parser.add_argument('--runs', type=int, default=5, help="Fresh interpreters per target")
+    parser.add_argument('--json', help="Append the results as one JSON line to this file")
+    parser.add_argument('--max-seconds', type=float, help="Fail when any median exceeds this many seconds")
+    parser.add_argument('--allow-skipped', action='store_true',
+                        help="Only warn about targets that could not be measured")
+    args = parser.parse_args()
+    if args.runs < 1:
+        parser.error("--runs must be at least 1")
+
+    results = run_benchmark(args.runs)
+
+    print(f"{'target':<22}{'min (s)':>10}{'median (s)':>12}{'wall median (s)':>17}")
+    for name, timing in results.items():
+        if 'skipped' in timing:
+            print(f"{name:<22}{'skipped':>10}  {timing['skipped']}")
+        else:
+            print(f"{name:<22}{timing['min']:>10.3f}{timing['median']:>12.3f}{timing['wall_median']:>17.3f}")
+
+    if args.json:
+        record = {'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'), 'runs': args.runs, 'results': results}
+        with open(args.json, 'a') as file:
+            file.write(json.dumps(record) + '\n')
+
+    if args.max_seconds is not None:
+        failed = False
+        skipped = [name for name, timing in results.items() if 'skipped' in timing]
+        if skipped:
+            level = "WARNING" if args.allow_skipped else "ERROR"
+            print(f"{level}: not measured against the budget: {', '.join(skipped)}", file=sys.stderr)
+            failed = not args.allow_skipped
+        over = [name for name, timing in results.items()
+                if 'skipped' not in timing and timing['median'] > args.max_seconds]
+        if over:
+            print(f"Over the {args.max_seconds}s budget: {', '.join(over)}", file=sys.stderr)
+            failed = True
+        if failed:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,197 @@
+"""Self-checks for the render service: python -m unittest test_dice_service"""
+import asyncio
+import base64
+import importlib.util
+import json
+import unittest
+from concurrent.futures.process import BrokenProcessPool
+from unittest import mock
+
+import dice_service
+
+HAS_PIPELINE = all(importlib.util.find_spec(name) for name in ('numpy', 'PIL'))
+
+PARAMS = {
+    'physical_width_ft': 1.0,
+    'physical_height_ft': 1.0,
+    'dice_type': 'Monochrome Dice',
+    'dice_option': 'White Dice',
+    'dice_size_option': 'Standard Dice (0.625")',
+    'selected_colors': [],
+}
+
+
+def payload(**overrides):
+    request = {'image': base64.b64encode(b'image').decode('ascii'), 'width_ft': 1, 'height_ft': 1}
+    request.update(overrides)
+    return request
+
+
+@unittest.skipUnless(HAS_PIPELINE, "needs NumPy and PIL")
+class ParseJobRequestTest(unittest.TestCase):
+
+    def test_valid_request(self):
+        image_bytes, params = dice_service.parse_job_request(payload())
+        self.assertEqual(image_bytes, b'image')
+        self.assertEqual(params, PARAMS)
+
+    def test_colors_must_be_a_list_of_strings(self):
+        for colors in ('red', ['red', 1], {'red': True}):
+            with self.assertRaisesRegex(ValueError, 'colors must be a list'):
+                dice_service.parse_job_request(payload(dice_type='Colored Dice', colors=colors))
+
+    def test_options_must_be_strings(self):
+        for field in ('dice_type', 'dice_option', 'dice_size'):
+            for value in ({}, ['Colored Dice'], 1):
+                with self.assertRaisesRegex(ValueError, f'{field} must be a string'):
+                    dice_service.parse_job_request(payload(**{field: value}))
+
+    def test_too_many_dice_are_rejected(self):
+        with self.assertRaisesRegex(ValueError, 'maximum'):
+            dice_service.parse_job_request(payload(width_ft=1000, height_ft=1000))
+
+    def test_non_finite_dimensions_are_rejected(self):
+        for value in ('nan', 'inf', '-inf'):
+            with self.assertRaisesRegex(ValueError, 'valid physical dimensions'):
+                dice_service.parse_job_request(payload(width_ft=value))
+
+    def test_invalid_image_and_payload_are_rejected(self):
+        with self.assertRaises(ValueError):
+            dice_service.parse_job_request(payload(image='not base64!'))
+        with self.assertRaises(ValueError):
+            dice_service.parse_job_request(['not', 'an', 'object'])
+
+
+class JobKeyTest(unittest.TestCase):
+
+    def test_key_depends_on_image_and_params(self):
+        key = dice_service.job_key(b'image', PARAMS)
+        self.assertEqual(key, dice_service.job_key(b'image', dict(reversed(list(PARAMS.items())))))
+        self.assertNotEqual(key, dice_service.job_key(b'other', PARAMS))
+        self.assertNotEqual(key, dice_service.job_key(b'image', dict(PARAMS, dice_option='Black Dice')))
+
+
+class SubmitTest(unittest.TestCase):
+
+    def setUp(self):
+        self.service = dice_service.RenderService(workers=1, queue_size=2, max_results=2)
+
+    def test_identical_requests_share_a_job(self):
+        job, created = self.service.submit(b'image', PARAMS)
+        same_job, created_again = self.service.submit(b'image', dict(PARAMS))
+        self.assertTrue(created)
+        self.assertFalse(created_again)
+        self.assertIs(job, same_job)
+        self.assertEqual(self.service.queue.qsize(), 1)
+
+    def test_failed_job_is_resubmitted(self):
+        job, _ = self.service.submit(b'image', PARAMS)
+        job['status'] = 'failed'
+        new_job, created = self.service.submit(b'image', PARAMS)
+        self.assertTrue(created)
+        self.assertIsNot(job, new_job)
+        self.assertEqual(new_job['status'], 'queued')
+
+    def test_full_queue_does_not_register_the_job(self):
+        self.service.submit(b'one', PARAMS)
+        self.service.submit(b'two', PARAMS)
+        with self.assertRaises(asyncio.QueueFull):
+            self.service.submit(b'three', PARAMS)
+        self.assertNotIn(dice_service.job_key(b'three', PARAMS), self.service.jobs)
+
+    def test_evict_drops_oldest_finished_jobs_only(self):
+        first, _ = self.service.submit(b'one', PARAMS)
+        second, _ = self.service.submit(b'two', PARAMS)
+        first['status'] = second['status'] = 'done'
+        self.service.queue.get_nowait()
+        self.service.queue.get_nowait()
+
+        third, _ = self.service.submit(b'three', PARAMS)
+        self.assertEqual(list(self.service.jobs), [second['id'], third['id']])
+
+        fourth, _ = self.service.submit(b'four', PARAMS)
+        self.assertEqual(list(self.service.jobs), [third['id'], fourth['id']])
+
+
+class BrokenPool:
+    """Executor stand-in whose workers have all died."""
+
+    def __init__(self):
+        self.shut_down = False
+
+    def submit(self, *args, **kwargs):
+        raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+
+class BrokenPoolTest(unittest.TestCase):
+
+    def test_broken_pool_fails_the_job_and_is_replaced(self):
+        async def run():
+            service = dice_service.RenderService(workers=1)
+            broken = BrokenPool()
+            service.pool = broken
+            service._new_pool = lambda: 'new pool'
+            job, _ = service.submit(b'image', PARAMS)
+            consumer = asyncio.create_task(service._consume())
+            await service.queue.join()
+            consumer.cancel()
+            return service, broken, job
+
+        service, broken, job = asyncio.run(run())
+        self.assertEqual(job['status'], 'failed')
+        self.assertTrue(broken.shut_down)
+        self.assertEqual(service.pool, 'new pool')
+
+
+class RunJobTest(unittest.TestCase):
+
+    def test_job_that_never_finishes_times_out(self):
+        running = {'id': 'job', 'status': 'running', 'error': None}
+        with mock.patch.object(dice_service, 'submit_job', return_value=running), \
+                mock.patch.object(dice_service, 'get_job', return_value=running), \
+                mock.patch.object(dice_service, 'POLL_INTERVAL', 0.01):
+            with self.assertRaisesRegex(RuntimeError, 'did not finish'):
+                dice_service.run_job('http://service', 'image.png', 1, 1, 'Monochrome Dice',
+                                     'White Dice', 'Standard Dice (0.625")', [], timeout=0.05)
+
+
+class DispatchTest(unittest.TestCase):
+
+    def dispatch(self, request):
+        async def run():
+            service = dice_service.RenderService()
+            reader = asyncio.StreamReader()
+            reader.feed_data(request)
+            reader.feed_eof()
+            return await service._dispatch(reader)
+        return asyncio.run(run())
+
+    def test_health(self):
+        status, _, _ = self.dispatch(b'GET /health HTTP/1.1\r\n\r\n')
+        self.assertEqual(status, 200)
+
+    def test_malformed_content_length(self):
+        status, _, _ = self.dispatch(b'POST /jobs HTTP/1.1\r\nContent-Length: abc\r\n\r\n')
+        self.assertEqual(status, 400)
+
+    def test_truncated_body(self):
+        status, _, _ = self.dispatch(b'POST /jobs HTTP/1.1\r\nContent-Length: 10\r\n\r\n{}')
+        self.assertEqual(status, 400)
+
+    @unittest.skipUnless(HAS_PIPELINE, "needs NumPy and PIL")
+    def test_invalid_option_type_is_a_bad_request(self):
+        body = json.dumps(payload(dice_size={})).encode('utf-8')
+        request = b'POST /jobs HTTP/1.1\r\nContent-Length: %d\r\n\r\n%s' % (len(body), body)
+        status, _, _ = self.dispatch(request)
+        self.assertEqual(status, 400)
+
+    def test_unknown_job(self):
+        status, _, _ = self.dispatch(b'GET /jobs/missing HTTP/1.1\r\n\r\n')
+        self.assertEqual(status, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,44 @@
+"""Self-checks for the evaluation metrics: python -m unittest test_evaluate_mosaic"""
+import importlib.util
+import unittest
+
+HAS_PIPELINE = all(importlib.util.find_spec(name) for name in ('numpy', 'PIL'))
+
+if HAS_PIPELINE:
+    import numpy as np
+
+    import evaluate_mosaic
+
+
+@unittest.skipUnless(HAS_PIPELINE, "needs NumPy and PIL")
+class MetricsTest(unittest.TestCase):
+
+    def setUp(self):
+        # A ramp with some structure, on the 0-255 scale
+        self.image = np.add.outer(np.arange(16.0), np.arange(16.0)) * 8
+
+    def test_identical_images(self):
+        self.assertEqual(evaluate_mosaic.mse(self.image, self.image), 0)
+        self.assertAlmostEqual(evaluate_mosaic.ssim(self.image, self.image), 1.0)
+        self.assertEqual(evaluate_mosaic.tone_curve(self.image, self.image)[1], 0)
+
+    def test_uniform_offset(self):
+        brighter = self.image + 10
+        self.assertAlmostEqual(evaluate_mosaic.mse(self.image, brighter), 100)
+        curve, error = evaluate_mosaic.tone_curve(self.image, brighter)
+        self.assertAlmostEqual(error, 10)
+        for target_mean, rendered_mean in curve:
+            self.assertAlmostEqual(rendered_mean - target_mean, 10, places=1)
+
+    def test_structure_lost(self):
+        flat = np.full_like(self.image, self.image.mean())
+        self.assertLess(evaluate_mosaic.ssim(self.image, flat), 0.5)
+        self.assertLess(evaluate_mosaic.ssim(self.image, 255 - self.image), 0)
+
+    def test_ssim_on_grid_smaller_than_window(self):
+        small = self.image[:3, :5]
+        self.assertAlmostEqual(evaluate_mosaic.ssim(small, small), 1.0)
+
+
+if __name__ == '__main__':
+    unittest.main()